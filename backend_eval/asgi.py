@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_eval.settings')
 
 application = get_asgi_application()
+
+# Resume evaluation jobs held while a provider circuit was open
+from evaluator.views import resume_held_jobs_on_startup  # noqa: E402
+
+resume_held_jobs_on_startup()
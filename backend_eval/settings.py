@@ -129,3 +129,15 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 JOB_DESCRIPTION_TEXT = 'Backend Engineer role: Django, REST, LLM, async processing'
 OPENROUTER_MODEL = config('OPENROUTER_MODEL', default='openrouter/auto')
+
+# Circuit breaker around the OpenRouter client (per model)
+CIRCUIT_FAILURE_RATE = config('CIRCUIT_FAILURE_RATE', default=0.5, cast=float)
+CIRCUIT_MIN_CALLS = config('CIRCUIT_MIN_CALLS', default=4, cast=int)
+CIRCUIT_WINDOW = config('CIRCUIT_WINDOW', default=20, cast=int)
+CIRCUIT_SLOW_CALL_SECONDS = config('CIRCUIT_SLOW_CALL_SECONDS', default=30, cast=float)
+CIRCUIT_COOLDOWN_SECONDS = config('CIRCUIT_COOLDOWN_SECONDS', default=30, cast=float)
+CIRCUIT_PROBE_TIMEOUT_SECONDS = config('CIRCUIT_PROBE_TIMEOUT_SECONDS', default=90, cast=float)
+CIRCUIT_RESUME_WORKERS = config('CIRCUIT_RESUME_WORKERS', default=2, cast=int)
+
+# Completed jobs older than this are moved out by `manage.py archive_jobs`
+JOB_RETENTION_DAYS = config('JOB_RETENTION_DAYS', default=30, cast=int)
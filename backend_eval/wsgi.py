@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_eval.settings')
 
 application = get_wsgi_application()
+
+# Resume evaluation jobs held while a provider circuit was open
+from evaluator.views import resume_held_jobs_on_startup  # noqa: E402
+
+resume_held_jobs_on_startup()
@@ -0,0 +1,177 @@
+# evaluator/breaker.py
+import logging
+import threading
+from collections import deque
+
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is short-circuited because the provider is unhealthy."""
+
+
+class CircuitBreaker:
+    """
+    Per-model circuit breaker tracking error rate and latency.
+
+    States:
+    - closed: calls flow normally, outcomes are recorded in a sliding window.
+    - open: calls are rejected until the cooldown elapses.
+    - half_open: a single probe call is allowed through. Success closes the
+      circuit, failure opens it again.
+
+    Calls slower than `slow_call_seconds` count as failures, so a provider
+    that answers only after hitting the timeout trips the breaker as well.
+
+    `allow()` returns a token that callers pass back to `record_*`.
+    Outcomes carrying a stale token (calls started before the last state
+    change) are ignored, so only the probe itself decides a half-open circuit.
+
+    `on_half_open(model)` is called when a probe may be sent, and again if no
+    outcome was recorded within `probe_timeout`. `on_close(model)` is called
+    after a successful probe closes the circuit. Errors raised by either
+    callback are logged and never reach the caller.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_rate: float = 0.5, min_calls: int = 4,
+                 window: int = 20, slow_call_seconds: float = 30,
+                 cooldown: float = 30, probe_timeout: float = None,
+                 on_half_open=None, on_close=None):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown = cooldown
+        self.probe_timeout = probe_timeout or cooldown
+        self.on_half_open = on_half_open
+        self.on_close = on_close
+        self._lock = threading.Lock()
+        self._circuits = {}
+
+    def _circuit(self, model: str) -> dict:
+        circuit = self._circuits.get(model)
+        if circuit is None:
+            circuit = {
+                'state': self.CLOSED,
+                'outcomes': deque(maxlen=self.window),
+                'probing': False,
+                # Bumped on every transition so stale timers and tokens become no-ops
+                'generation': 1,
+            }
+            self._circuits[model] = circuit
+        return circuit
+
+    # ----- State -----
+    def state(self, model: str) -> str:
+        with self._lock:
+            return self._circuit(model)['state']
+
+    def is_open(self, model: str) -> bool:
+        return self.state(model) == self.OPEN
+
+    def allow(self, model: str):
+        """
+        Return a (truthy) token if a call to `model` may proceed, None otherwise.
+        In half-open state only one probe call is let through at a time.
+        """
+        with self._lock:
+            circuit = self._circuit(model)
+            if circuit['state'] == self.CLOSED:
+                return circuit['generation']
+            if circuit['state'] == self.HALF_OPEN and not circuit['probing']:
+                circuit['probing'] = True
+                return circuit['generation']
+            return None
+
+    def _is_current(self, circuit: dict, token) -> bool:
+        """
+        Whether an outcome should count. Caller holds the lock.
+        In half-open only the probe's token counts; a missing token is
+        accepted while closed.
+        """
+        if circuit['state'] == self.OPEN:
+            return False
+        if token is None:
+            return circuit['state'] == self.CLOSED
+        return token == circuit['generation']
+
+    # ----- Outcomes -----
+    def record_success(self, model: str, latency: float, token=None) -> None:
+        if latency >= self.slow_call_seconds:
+            self.record_failure(model, latency, token)
+            return
+
+        closed = False
+        with self._lock:
+            circuit = self._circuit(model)
+            if not self._is_current(circuit, token):
+                return
+            if circuit['state'] == self.HALF_OPEN:
+                circuit['state'] = self.CLOSED
+                circuit['probing'] = False
+                circuit['generation'] += 1
+                circuit['outcomes'].clear()
+                closed = True
+            circuit['outcomes'].append(True)
+
+        if closed:
+            self._notify(self.on_close, model)
+
+    def record_failure(self, model: str, latency: float = 0.0, token=None) -> None:
+        with self._lock:
+            circuit = self._circuit(model)
+            if not self._is_current(circuit, token):
+                return
+            circuit['outcomes'].append(False)
+            if circuit['state'] == self.HALF_OPEN:
+                self._trip(model, circuit)
+                return
+
+            outcomes = circuit['outcomes']
+            if len(outcomes) < self.min_calls:
+                return
+            failures = outcomes.count(False)
+            if failures / len(outcomes) >= self.failure_rate:
+                self._trip(model, circuit)
+
+    # ----- Transitions -----
+    def _schedule(self, delay: float, func, model: str, generation: int) -> None:
+        timer = threading.Timer(delay, func, args=(model, generation))
+        timer.daemon = True
+        timer.start()
+
+    def _trip(self, model: str, circuit: dict) -> None:
+        """Open the circuit and schedule a half-open probe. Caller holds the lock."""
+        circuit['state'] = self.OPEN
+        circuit['probing'] = False
+        circuit['generation'] += 1
+        self._schedule(self.cooldown, self._half_open, model, circuit['generation'])
+
+    def _half_open(self, model: str, generation: int) -> None:
+        """
+        Let one probe through. Also used as the probe watchdog: if the
+        previous probe never recorded an outcome, allow another one.
+        """
+        with self._lock:
+            circuit = self._circuit(model)
+            if circuit['generation'] != generation or circuit['state'] == self.CLOSED:
+                return
+            circuit['state'] = self.HALF_OPEN
+            circuit['probing'] = False
+            circuit['generation'] += 1
+            self._schedule(self.probe_timeout, self._half_open, model, circuit['generation'])
+
+        self._notify(self.on_half_open, model)
+
+    def _notify(self, callback, model: str) -> None:
+        if callback is None:
+            return
+        try:
+            callback(model)
+        except Exception:
+            logger.exception('Circuit breaker callback failed for model %s', model)
@@ -4,16 +4,19 @@ import json
 import requests
 from decouple import config
 
+from evaluator.breaker import CircuitOpenError
+
 
 class OpenRouterClient:
     """
     Wrapper for OpenRouter Chat API with retry, backoff, and JSON-safe parsing.
     Handles 429 (rate limit) errors gracefully.
+    An optional CircuitBreaker short-circuits calls while the provider is down.
     """
 
     CHAT_URL = "https://openrouter.ai/api/v1/chat/completions"
 
-    def __init__(self, api_key: str = None, timeout: int = 60):
+    def __init__(self, api_key: str = None, timeout: int = 60, breaker=None):
         self.api_key = api_key or config("OPENROUTER_API_KEY")
         self.session = requests.Session()
         self.headers = {
@@ -21,6 +24,7 @@ class OpenRouterClient:
             "Content-Type": "application/json"
         }
         self.timeout = timeout
+        self.breaker = breaker
 
     def _try_parse_json(self, text: str):
         """Try to parse JSON from the text response."""
@@ -38,6 +42,16 @@ class OpenRouterClient:
                 pass
         return None
 
+    def _record(self, model: str, started: float, token, ok: bool):
+        """Report the outcome and latency of one attempt to the breaker."""
+        if not self.breaker:
+            return
+        latency = time.monotonic() - started
+        if ok:
+            self.breaker.record_success(model, latency, token)
+        else:
+            self.breaker.record_failure(model, latency, token)
+
     def chat(self, model: str, messages: list,
              temperature: float = 0.2,
              max_tokens: int = 1200,
@@ -46,7 +60,12 @@ class OpenRouterClient:
         """
         Call OpenRouter chat completions API.
         Ensures a dict response (parsed JSON or fallback wrapper).
+        Raises CircuitOpenError if the breaker for `model` is open.
         """
+        token = self.breaker.allow(model) if self.breaker else None
+        if self.breaker and not token:
+            raise CircuitOpenError(f"Circuit open for model {model}")
+
         payload = {
             "model": model,
             "messages": messages,
@@ -59,6 +78,11 @@ class OpenRouterClient:
         last_err = None
 
         for attempt in range(1, retries + 1):
+            # Stop retrying as soon as the provider is considered down
+            if attempt > 1 and self.breaker and self.breaker.is_open(model):
+                raise CircuitOpenError(f"Circuit open for model {model}") from last_err
+
+            started = time.monotonic()
             try:
                 resp = self.session.post(
                     self.CHAT_URL,
@@ -69,6 +93,7 @@ class OpenRouterClient:
 
                 # --- Handle 429 Too Many Requests ---
                 if resp.status_code == 429:
+                    self._record(model, started, token, ok=False)
                     if attempt == retries:
                         return {"error": "Rate limited by provider. Please retry later.", "code": 429}
                     time.sleep(delay * 5)  # longer backoff for rate limit
@@ -80,16 +105,8 @@ class OpenRouterClient:
 
                 choice = data.get("choices", [{}])[0].get("message", {}).get("content")
 
-                if isinstance(choice, dict):
-                    return choice
-
-                parsed = self._try_parse_json(choice)
-                if parsed is not None:
-                    return parsed
-
-                return {"__raw": choice, "__meta": data}
-
             except Exception as e:
+                self._record(model, started, token, ok=False)
                 last_err = e
                 if attempt == retries:
                     raise RuntimeError(
@@ -97,5 +114,18 @@ class OpenRouterClient:
                     ) from e
                 time.sleep(delay)
                 delay *= backoff_factor
+                continue
+
+            # Recorded outside the try so breaker callbacks can never trigger a retry
+            self._record(model, started, token, ok=True)
+
+            if isinstance(choice, dict):
+                return choice
+
+            parsed = self._try_parse_json(choice)
+            if parsed is not None:
+                return parsed
+
+            return {"__raw": choice, "__meta": data}
 
         raise RuntimeError("Unexpected failure in OpenRouter call") from last_err
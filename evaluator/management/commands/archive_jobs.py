@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from evaluator.models import ArchivedJob
+from evaluator.retention import (
+    archive_jobs, archivable_jobs, collect_orphan_files, conflicting_jobs, restore_job,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Archive completed jobs older than N days into a compressed table '
+        'and delete orphaned upload files. Run it periodically (e.g. from cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.JOB_RETENTION_DAYS,
+            help='Archive completed jobs not updated for this many days.',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--grace-seconds', type=int, default=3600,
+            help='Keep orphaned upload files younger than this.',
+        )
+        parser.add_argument('--skip-gc', action='store_true', help='Do not delete orphaned upload files.')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be done.')
+        parser.add_argument('--restore', type=int, metavar='JOB_ID', help='Restore an archived job and exit.')
+
+    def handle(self, *args, **options):
+        if options['restore'] is not None:
+            try:
+                job = restore_job(options['restore'])
+            except ArchivedJob.DoesNotExist:
+                raise CommandError(f'Archived job {options["restore"]} not found')
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(f'Restored job {job.id}'))
+            return
+
+        dry_run = options['dry_run']
+        prefix = '[dry-run] ' if dry_run else ''
+
+        conflicts = conflicting_jobs(options['days'])
+        if conflicts:
+            self.stderr.write(self.style.WARNING(
+                f'Skipped {len(conflicts)} job(s) already present in the archive: '
+                + ', '.join(str(job_id) for job_id in conflicts)
+            ))
+
+        archived = archive_jobs(options['days'], batch_size=options['batch_size'], dry_run=dry_run)
+        self.stdout.write(f'{prefix}Archived {archived} job(s)')
+
+        if not options['skip_gc']:
+            # A dry run archives nothing, so drop the references of jobs that would have been archived
+            exclude = archivable_jobs(options['days']) if dry_run else None
+            removed = collect_orphan_files(
+                grace_seconds=options['grace_seconds'], dry_run=dry_run, exclude=exclude,
+            )
+            self.stdout.write(f'{prefix}Removed {len(removed)} orphaned file(s)')
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evaluator', '0002_archivedjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='held_model',
+            field=models.CharField(blank=True, db_index=True, max_length=255, null=True),
+        ),
+    ]
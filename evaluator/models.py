@@ -1,3 +1,6 @@
+import json
+import zlib
+
 from django.db import models
 
 # Create your models here.
@@ -12,9 +15,34 @@ class Job(models.Model):
     report_file = models.FileField(upload_to='uploads/report/', null=True, blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
     result = models.JSONField(null=True, blank=True)
+    # Model slug the job is waiting on while its circuit is open
+    held_model = models.CharField(max_length=255, null=True, blank=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f'Job {self.pk} - {self.status}'
 
+
+class ArchivedJob(models.Model):
+    '''
+    Compressed copy of a completed Job moved out of the hot table.
+    The result JSON is stored zlib-compressed in `payload`.
+    '''
+    job_id = models.BigIntegerField(unique=True)
+    status = models.CharField(max_length=20)
+    payload = models.BinaryField()
+    created_at = models.DateTimeField()
+    completed_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    @staticmethod
+    def compress(result) -> bytes:
+        return zlib.compress(json.dumps(result).encode('utf-8'))
+
+    @property
+    def result(self):
+        return json.loads(zlib.decompress(bytes(self.payload)).decode('utf-8'))
+
+    def __str__(self):
+        return f'ArchivedJob {self.job_id} - {self.status}'
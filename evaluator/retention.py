@@ -0,0 +1,151 @@
+# evaluator/retention.py
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from evaluator.models import Job, ArchivedJob
+
+
+ARCHIVABLE_STATUSES = ('completed',)
+UPLOAD_DIRS = ('uploads/cv', 'uploads/report')
+
+
+def _expired_jobs(days: int):
+    cutoff = timezone.now() - timedelta(days=days)
+    return Job.objects.filter(status__in=ARCHIVABLE_STATUSES, updated_at__lt=cutoff)
+
+
+def archivable_jobs(days: int):
+    """
+    Completed Jobs last updated more than `days` ago that can be archived.
+    Jobs whose id already exists in ArchivedJob are left out.
+    """
+    return _expired_jobs(days).exclude(id__in=ArchivedJob.objects.values('job_id'))
+
+
+def conflicting_jobs(days: int) -> list:
+    """
+    Ids of expired Jobs that cannot be archived because an ArchivedJob
+    with the same id already exists (e.g. ids reused after a DB reset).
+    """
+    return list(
+        _expired_jobs(days)
+        .filter(id__in=ArchivedJob.objects.values('job_id'))
+        .order_by('id')
+        .values_list('id', flat=True)
+    )
+
+
+def archive_jobs(days: int, batch_size: int = 500, dry_run: bool = False) -> int:
+    """
+    Move completed Jobs last updated more than `days` ago into ArchivedJob.
+    Their upload files become orphans and are removed by collect_orphan_files.
+    Jobs listed by conflicting_jobs are kept in place.
+    Returns the number of archived (or, with dry_run, archivable) jobs.
+    """
+    queryset = archivable_jobs(days)
+
+    if dry_run:
+        return queryset.count()
+
+    archived = 0
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        with transaction.atomic():
+            ArchivedJob.objects.bulk_create(
+                [
+                    ArchivedJob(
+                        job_id=job.id,
+                        status=job.status,
+                        payload=ArchivedJob.compress(job.result),
+                        created_at=job.created_at,
+                        completed_at=job.updated_at,
+                    )
+                    for job in batch
+                ]
+            )
+            Job.objects.filter(id__in=[job.id for job in batch]).delete()
+
+        archived += len(batch)
+
+    return archived
+
+
+def collect_orphan_files(grace_seconds: int = 3600, dry_run: bool = False, exclude=None) -> list:
+    """
+    Delete upload files no longer referenced by any Job.
+    Files newer than `grace_seconds` are kept, since uploads are written
+    to disk before their Job row is committed.
+    References held by the `exclude` Job queryset are ignored, so a dry run
+    can account for jobs that archive_jobs would remove.
+    Returns the list of removed (or, with dry_run, removable) paths.
+    """
+    jobs = Job.objects.all()
+    if exclude is not None:
+        jobs = jobs.exclude(id__in=exclude.values('id'))
+
+    referenced = set()
+    for cv_name, report_name in jobs.values_list('cv_file', 'report_file').iterator():
+        if cv_name:
+            referenced.add(os.path.normpath(cv_name))
+        if report_name:
+            referenced.add(os.path.normpath(report_name))
+
+    media_root = str(settings.MEDIA_ROOT)
+    cutoff = time.time() - grace_seconds
+    removed = []
+
+    for upload_dir in UPLOAD_DIRS:
+        base = os.path.join(media_root, upload_dir)
+        if not os.path.isdir(base):
+            continue
+
+        for root, _, files in os.walk(base):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.normpath(os.path.relpath(path, media_root))
+                if name in referenced or os.path.getmtime(path) > cutoff:
+                    continue
+                if not dry_run:
+                    os.remove(path)
+                removed.append(path)
+
+    return removed
+
+
+def restore_job(job_id: int) -> Job:
+    """
+    Move an archived result back into the Job table.
+    Upload files are not restored; they are usually collected already.
+    Raises ArchivedJob.DoesNotExist if the job was never archived, and
+    ValueError if a Job with the same id already exists.
+    """
+    archived = ArchivedJob.objects.get(job_id=job_id)
+    if Job.objects.filter(id=job_id).exists():
+        raise ValueError(f'Job {job_id} already exists')
+
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(
+                id=archived.job_id,
+                status=archived.status,
+                result=archived.result,
+            )
+            # created_at is auto_now_add, restore the original value.
+            # updated_at stays fresh so the job is not re-archived on the next run.
+            Job.objects.filter(id=job.id).update(created_at=archived.created_at)
+            archived.delete()
+    except IntegrityError as e:
+        raise ValueError(f'Job {job_id} already exists') from e
+
+    job.refresh_from_db()
+    return job
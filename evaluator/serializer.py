@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Job
+from .models import Job, ArchivedJob
 
 
 class UploadSerializer(serializers.ModelSerializer):
@@ -12,3 +12,12 @@ class JobResultSerializer(serializers.ModelSerializer):
     class Meta:
         model = Job
         fields = ["id", "status", "result", "created_at"]
+
+
+class ArchivedJobResultSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source="job_id")
+    result = serializers.JSONField()
+
+    class Meta:
+        model = ArchivedJob
+        fields = ["id", "status", "result", "created_at"]
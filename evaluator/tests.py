@@ -1,3 +1,449 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from evaluator import views
+from evaluator.breaker import CircuitBreaker, CircuitOpenError
+from evaluator.llm import OpenRouterClient
+from evaluator.models import Job, ArchivedJob
+from evaluator.retention import archive_jobs, collect_orphan_files, restore_job
+
+
+MODEL = 'test/model'
+
+
+def _wait_for(event: threading.Event) -> bool:
+    return event.wait(timeout=2)
+
+
+class CircuitBreakerTests(TestCase):
+    def test_trips_at_min_calls_and_failure_rate(self):
+        breaker = CircuitBreaker(failure_rate=0.5, min_calls=4, cooldown=60)
+        breaker.record_failure(MODEL)
+        breaker.record_failure(MODEL)
+        breaker.record_success(MODEL, 0.1)
+        # 2/3 failures, but fewer than min_calls recorded
+        self.assertEqual(breaker.state(MODEL), CircuitBreaker.CLOSED)
+
+        breaker.record_failure(MODEL)
+        self.assertEqual(breaker.state(MODEL), CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow(MODEL))
+
+    def test_below_failure_rate_stays_closed(self):
+        breaker = CircuitBreaker(failure_rate=0.5, min_calls=4, cooldown=60)
+        for _ in range(3):
+            breaker.record_success(MODEL, 0.1)
+        breaker.record_failure(MODEL)
+        self.assertEqual(breaker.state(MODEL), CircuitBreaker.CLOSED)
+
+    def test_slow_success_counts_as_failure(self):
+        breaker = CircuitBreaker(min_calls=1, slow_call_seconds=5, cooldown=60)
+        breaker.record_success(MODEL, 10)
+        self.assertEqual(breaker.state(MODEL), CircuitBreaker.OPEN)
+
+    def test_single_probe_in_half_open(self):
+        half_open = threading.Event()
+        breaker = CircuitBreaker(min_calls=1, cooldown=0.01, probe_timeout=60,
+                                 on_half_open=lambda model: half_open.set())
+        breaker.record_failure(MODEL)
+        self.assertTrue(_wait_for(half_open))
+
+        self.assertEqual(breaker.state(MODEL), CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow(MODEL))
+        self.assertFalse(breaker.allow(MODEL))
+
+    def test_failed_probe_reopens(self):
+        half_open = threading.Event()
+        breaker = CircuitBreaker(min_calls=1, cooldown=0.01, probe_timeout=60,
+                                 on_half_open=lambda model: half_open.set())
+        breaker.record_failure(MODEL)
+        self.assertTrue(_wait_for(half_open))
+        half_open.clear()
+
+        token = breaker.allow(MODEL)
+        self.assertTrue(token)
+        breaker.record_failure(MODEL, token=token)
+        self.assertEqual(breaker.state(MODEL), CircuitBreaker.OPEN)
+        self.assertFalse(breaker.allow(MODEL))
+        # A new probe is scheduled after the cooldown
+        self.assertTrue(_wait_for(half_open))
+
+    def test_successful_probe_closes(self):
+        half_open = threading.Event()
+        closed = []
+        breaker = CircuitBreaker(min_calls=1, cooldown=0.01, probe_timeout=60,
+                                 on_half_open=lambda model: half_open.set(),
+                                 on_close=closed.append)
+        breaker.record_failure(MODEL)
+        self.assertTrue(_wait_for(half_open))
+
+        token = breaker.allow(MODEL)
+        self.assertTrue(token)
+        breaker.record_success(MODEL, 0.1, token)
+        self.assertEqual(breaker.state(MODEL), CircuitBreaker.CLOSED)
+        self.assertEqual(closed, [MODEL])
+
+    def test_late_outcomes_ignored_in_half_open(self):
+        half_open = threading.Event()
+        breaker = CircuitBreaker(min_calls=1, slow_call_seconds=5, cooldown=0.01,
+                                 probe_timeout=60, on_half_open=lambda model: half_open.set())
+        stale = breaker.allow(MODEL)
+        breaker.record_failure(MODEL, token=breaker.allow(MODEL))
+        self.assertTrue(_wait_for(half_open))
+        probe = breaker.allow(MODEL)
+
+        # Calls started before the trip finish while the probe is in flight
+        breaker.record_failure(MODEL, 60, stale)
+        breaker.record_success(MODEL, 10, stale)
+        self.assertEqual(breaker.state(MODEL), CircuitBreaker.HALF_OPEN)
+        breaker.record_success(MODEL, 0.1, stale)
+        self.assertEqual(breaker.state(MODEL), CircuitBreaker.HALF_OPEN)
+        # Untokened outcomes cannot decide a half-open circuit either
+        breaker.record_success(MODEL, 0.1)
+        self.assertEqual(breaker.state(MODEL), CircuitBreaker.HALF_OPEN)
+
+        breaker.record_success(MODEL, 0.1, probe)
+        self.assertEqual(breaker.state(MODEL), CircuitBreaker.CLOSED)
+
+    def test_callback_errors_are_contained(self):
+        half_open = threading.Event()
+
+        def on_close(model):
+            raise RuntimeError('db down')
+
+        breaker = CircuitBreaker(min_calls=1, cooldown=0.01, probe_timeout=60,
+                                 on_half_open=lambda model: half_open.set(), on_close=on_close)
+        breaker.record_failure(MODEL)
+        self.assertTrue(_wait_for(half_open))
+
+        with self.assertLogs('evaluator.breaker', level='ERROR'):
+            breaker.record_success(MODEL, 0.1, breaker.allow(MODEL))
+        self.assertEqual(breaker.state(MODEL), CircuitBreaker.CLOSED)
+
+    def test_probe_retried_when_no_outcome_recorded(self):
+        calls = []
+        retried = threading.Event()
+
+        def on_half_open(model):
+            calls.append(model)
+            if len(calls) == 2:
+                retried.set()
+
+        breaker = CircuitBreaker(min_calls=1, cooldown=0.01, probe_timeout=0.01,
+                                 on_half_open=on_half_open)
+        breaker.record_failure(MODEL)
+        self.assertFalse(breaker.allow(MODEL))
+        self.assertTrue(_wait_for(retried))
+        self.assertEqual(breaker.state(MODEL), CircuitBreaker.HALF_OPEN)
+
+
+class OpenRouterClientBreakerTests(TestCase):
+    def test_chat_raises_when_circuit_opens_between_retries(self):
+        breaker = CircuitBreaker(min_calls=1, cooldown=60)
+        client = OpenRouterClient(api_key='test', breaker=breaker)
+        client.session.post = mock.Mock(side_effect=ConnectionError('down'))
+
+        with mock.patch('evaluator.llm.time.sleep'):
+            with self.assertRaises(CircuitOpenError):
+                client.chat(model=MODEL, messages=[], retries=3)
+
+        self.assertEqual(client.session.post.call_count, 1)
+
+    def test_callback_error_does_not_retry_successful_call(self):
+        half_open = threading.Event()
+
+        def on_close(model):
+            raise RuntimeError('db down')
+
+        breaker = CircuitBreaker(min_calls=1, cooldown=0.01, probe_timeout=60,
+                                 on_half_open=lambda model: half_open.set(), on_close=on_close)
+        breaker.record_failure(MODEL)
+        self.assertTrue(_wait_for(half_open))
+
+        client = OpenRouterClient(api_key='test', breaker=breaker)
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {'choices': [{'message': {'content': '{"ok": true}'}}]}
+        client.session.post = mock.Mock(return_value=response)
+
+        with self.assertLogs('evaluator.breaker', level='ERROR'):
+            self.assertEqual(client.chat(model=MODEL, messages=[]), {'ok': True})
+        self.assertEqual(client.session.post.call_count, 1)
+        self.assertEqual(breaker.state(MODEL), CircuitBreaker.CLOSED)
+
+    def test_chat_rejected_while_open(self):
+        breaker = CircuitBreaker(min_calls=1, cooldown=60)
+        breaker.record_failure(MODEL)
+        client = OpenRouterClient(api_key='test', breaker=breaker)
+        client.session.post = mock.Mock()
+
+        with self.assertRaises(CircuitOpenError):
+            client.chat(model=MODEL, messages=[])
+        client.session.post.assert_not_called()
+
+
+class HeldJobTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(os.environ, {'OPENROUTER_API_KEY': 'test'})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.breaker = CircuitBreaker(min_calls=1, cooldown=60)
+        patcher = mock.patch.object(views, 'breaker', self.breaker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.executor = mock.Mock()
+        patcher = mock.patch.object(views, 'resume_executor', self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_process_job_holds_when_circuit_open(self):
+        self.breaker.record_failure(MODEL)
+        job = Job.objects.create()
+
+        views.process_job(job.id, MODEL)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(job.held_model, MODEL)
+        self.assertIsNone(job.result)
+
+    def test_process_job_holds_when_call_trips_circuit(self):
+        job = Job.objects.create()
+
+        with mock.patch.object(OpenRouterClient, 'chat', side_effect=CircuitOpenError('open')):
+            views.process_job(job.id, MODEL)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertEqual(job.held_model, MODEL)
+
+    def test_resume_held_jobs_dispatches_through_executor(self):
+        held = [Job.objects.create(held_model=MODEL) for _ in range(3)]
+        Job.objects.create(held_model='other/model')
+
+        views.resume_held_jobs(MODEL)
+
+        self.assertEqual(
+            [c.args for c in self.executor.submit.call_args_list],
+            [(views.resume_job, job.id, MODEL) for job in held],
+        )
+        # Holds stay on the rows until a worker starts each job
+        self.assertEqual(Job.objects.filter(held_model=MODEL).count(), 3)
+
+    def test_resume_job_claims_each_job_once(self):
+        job = Job.objects.create(held_model=MODEL)
+
+        with mock.patch.object(views, 'process_job') as process_job:
+            views.resume_job(job.id, MODEL)
+            views.resume_job(job.id, MODEL)
+
+        process_job.assert_called_once_with(job.id, MODEL)
+        job.refresh_from_db()
+        self.assertIsNone(job.held_model)
+
+    def test_resume_job_keeps_hold_while_circuit_open(self):
+        self.breaker.record_failure(MODEL)
+        job = Job.objects.create(held_model=MODEL)
+
+        with mock.patch.object(views, 'process_job') as process_job:
+            views.resume_job(job.id, MODEL)
+
+        process_job.assert_not_called()
+        job.refresh_from_db()
+        self.assertEqual(job.held_model, MODEL)
+
+    def test_probe_dispatches_single_existing_job(self):
+        gone = Job.objects.create(held_model=MODEL)
+        first = Job.objects.create(held_model=MODEL)
+        Job.objects.create(held_model=MODEL)
+        gone.delete()
+
+        views.probe_held_jobs(MODEL)
+
+        self.executor.submit.assert_called_once_with(views.resume_job, first.id, MODEL)
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def make_job(self, days_old: int, status: str = 'completed', result=None, cv: bytes = None) -> Job:
+        job = Job.objects.create(status=status, result=result if result is not None else {'score': 7})
+        if cv is not None:
+            job.cv_file.save('cv.txt', ContentFile(cv))
+            self.age_file(job.cv_file.path)
+        Job.objects.filter(id=job.id).update(updated_at=timezone.now() - timedelta(days=days_old))
+        job.refresh_from_db()
+        return job
+
+    def age_file(self, path: str, seconds: int = 7200) -> None:
+        stamp = time.time() - seconds
+        os.utime(path, (stamp, stamp))
+
+    def run_command(self, *args) -> str:
+        out = StringIO()
+        call_command('archive_jobs', *args, stdout=out, stderr=out)
+        return out.getvalue()
+
+    def test_archive_moves_rows_and_keeps_result(self):
+        result = {'cv_match_rate': 0.8, 'overall_summary': 'Strong candidate.'}
+        job = self.make_job(days_old=40, result=result)
+
+        self.assertEqual(archive_jobs(30), 1)
+
+        self.assertFalse(Job.objects.filter(id=job.id).exists())
+        archived = ArchivedJob.objects.get(job_id=job.id)
+        self.assertEqual(archived.result, result)
+        self.assertEqual(archived.created_at, job.created_at)
+
+    def test_archive_respects_cutoff_and_status(self):
+        old = self.make_job(days_old=40)
+        recent = self.make_job(days_old=5)
+        queued = self.make_job(days_old=40, status='queued')
+
+        archive_jobs(30)
+
+        self.assertTrue(ArchivedJob.objects.filter(job_id=old.id).exists())
+        self.assertTrue(Job.objects.filter(id=recent.id).exists())
+        self.assertTrue(Job.objects.filter(id=queued.id).exists())
+        self.assertEqual(ArchivedJob.objects.count(), 1)
+
+    def test_recently_evaluated_old_upload_not_archived(self):
+        job = self.make_job(days_old=40, status='queued', result={})
+        result = {
+            'cv_match_rate': 0.5, 'cv_feedback': 'ok',
+            'project_scores': {
+                'correctness': 3, 'code_quality': 3, 'resilience': 3,
+                'documentation': 3, 'creativity': 3,
+            },
+            'project_score': 6.0, 'project_feedback': 'ok', 'overall_summary': 'ok',
+        }
+        evaluated_at = timezone.now()
+
+        with mock.patch.dict(os.environ, {'OPENROUTER_API_KEY': 'test'}), \
+                mock.patch.object(views, 'breaker', CircuitBreaker(cooldown=60)), \
+                mock.patch.object(OpenRouterClient, 'chat', return_value=result):
+            views.process_job(job.id, MODEL)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertGreaterEqual(job.updated_at, evaluated_at)
+        self.assertEqual(archive_jobs(30), 0)
+        self.assertTrue(Job.objects.filter(id=job.id).exists())
+
+        archive_jobs(0)
+        self.assertGreaterEqual(ArchivedJob.objects.get(job_id=job.id).completed_at, evaluated_at)
+
+    def test_archive_dry_run_changes_nothing(self):
+        job = self.make_job(days_old=40)
+
+        self.assertEqual(archive_jobs(30, dry_run=True), 1)
+        self.assertTrue(Job.objects.filter(id=job.id).exists())
+        self.assertFalse(ArchivedJob.objects.exists())
+
+    def test_archive_keeps_jobs_conflicting_with_archive(self):
+        job = self.make_job(days_old=40, result={'new': True})
+        ArchivedJob.objects.create(
+            job_id=job.id, status='completed', payload=ArchivedJob.compress({'old': True}),
+            created_at=job.created_at, completed_at=job.updated_at,
+        )
+
+        self.assertEqual(archive_jobs(30), 0)
+        output = self.run_command('--days', '30', '--skip-gc')
+
+        job.refresh_from_db()
+        self.assertEqual(job.result, {'new': True})
+        self.assertEqual(ArchivedJob.objects.get(job_id=job.id).result, {'old': True})
+        self.assertIn(f'Skipped 1 job(s) already present in the archive: {job.id}', output)
+
+    def test_gc_keeps_referenced_and_recent_files(self):
+        kept = self.make_job(days_old=1, cv=b'referenced')
+        orphan_dir = os.path.join(self.media_root, 'uploads', 'report')
+        os.makedirs(orphan_dir)
+        orphan = os.path.join(orphan_dir, 'orphan.pdf')
+        recent = os.path.join(orphan_dir, 'recent.pdf')
+        for path in (orphan, recent):
+            with open(path, 'wb') as f:
+                f.write(b'x')
+        self.age_file(orphan)
+
+        removed = collect_orphan_files(grace_seconds=3600)
+
+        self.assertEqual(removed, [orphan])
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(recent))
+        self.assertTrue(os.path.exists(kept.cv_file.path))
+
+    def test_dry_run_reports_files_of_jobs_to_archive(self):
+        job = self.make_job(days_old=40, cv=b'old cv')
+        path = job.cv_file.path
+
+        output = self.run_command('--days', '30', '--dry-run')
+        self.assertIn('[dry-run] Archived 1 job(s)', output)
+        self.assertIn('[dry-run] Removed 1 orphaned file(s)', output)
+        self.assertTrue(os.path.exists(path))
+
+        output = self.run_command('--days', '30')
+        self.assertIn('Removed 1 orphaned file(s)', output)
+        self.assertFalse(os.path.exists(path))
+
+    def test_restore(self):
+        job = self.make_job(days_old=40, result={'score': 9})
+        archive_jobs(30)
+
+        output = self.run_command('--restore', str(job.id))
+
+        self.assertIn(f'Restored job {job.id}', output)
+        restored = Job.objects.get(id=job.id)
+        self.assertEqual(restored.result, {'score': 9})
+        self.assertEqual(restored.created_at, job.created_at)
+        self.assertFalse(ArchivedJob.objects.exists())
+
+    def test_restore_unknown_id(self):
+        with self.assertRaisesMessage(CommandError, 'Archived job 999 not found'):
+            self.run_command('--restore', '999')
+
+    def test_restore_existing_job_id(self):
+        job = self.make_job(days_old=40)
+        ArchivedJob.objects.create(
+            job_id=job.id, status='completed', payload=ArchivedJob.compress({}),
+            created_at=job.created_at, completed_at=job.updated_at,
+        )
+
+        with self.assertRaises(ValueError):
+            restore_job(job.id)
+        with self.assertRaisesMessage(CommandError, f'Job {job.id} already exists'):
+            self.run_command('--restore', str(job.id))
+        self.assertTrue(ArchivedJob.objects.filter(job_id=job.id).exists())
+
+    def test_result_view_falls_back_to_archive(self):
+        job = self.make_job(days_old=40, result={'score': 5})
+        archive_jobs(30)
+
+        response = APIClient().get(f'/result/{job.id}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], job.id)
+        self.assertEqual(response.json()['status'], 'completed')
+        self.assertEqual(response.json()['result'], {'score': 5})
+
+    def test_result_view_not_found(self):
+        response = APIClient().get('/result/999/')
+        self.assertEqual(response.status_code, 404)
@@ -1,15 +1,18 @@
 import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from django.conf import settings
+from django.db import DatabaseError
 from decouple import config
 
-from evaluator.models import Job
-from evaluator.serializer import UploadSerializer, JobResultSerializer
+from evaluator.models import Job, ArchivedJob
+from evaluator.serializer import UploadSerializer, JobResultSerializer, ArchivedJobResultSerializer
 from evaluator.utils import read_uploaded_file_text
 from evaluator.llm import OpenRouterClient
+from evaluator.breaker import CircuitBreaker, CircuitOpenError
 from evaluator.validate import validate_evaluation_result
 
 
@@ -53,14 +56,106 @@ Return ONLY a JSON object with keys:
 '''
 
 
+def dispatch_job(job_id: int, model_slug: str) -> None:
+    """
+    Run process_job for a Job in a background thread.
+    """
+    threading.Thread(target=process_job, args=(job_id, model_slug), daemon=True).start()
+
+
+# Held jobs are drained through a small pool so a recovered provider
+# is not hit by the whole backlog at once
+resume_executor = ThreadPoolExecutor(
+    max_workers=settings.CIRCUIT_RESUME_WORKERS,
+    thread_name_prefix='resume-job',
+)
+
+
+def hold_job(job: Job, model_slug: str) -> None:
+    """
+    Keep a Job queued while the circuit for its model is open.
+    The hold is stored on the row so any worker can resume it.
+    """
+    job.status = 'queued'
+    job.held_model = model_slug
+    job.save(update_fields=['status', 'held_model', 'updated_at'])
+
+
+def resume_job(job_id: int, model_slug: str) -> None:
+    """
+    Executor entry point for a held Job. The hold is cleared only here,
+    when a worker actually starts the job, so jobs still waiting in the
+    executor queue stay held in the DB and survive a restart.
+    """
+    if breaker.is_open(model_slug):
+        return
+    # Conditional UPDATE: only one worker (or process) wins the claim
+    claimed = Job.objects.filter(id=job_id, held_model=model_slug).update(held_model=None)
+    if claimed:
+        process_job(job_id, model_slug)
+
+
+def probe_held_jobs(model_slug: str) -> None:
+    """
+    Half-open callback: dispatch one held Job as the probe.
+    """
+    job_id = Job.objects.filter(held_model=model_slug).order_by('id').values_list('id', flat=True).first()
+    if job_id is not None:
+        resume_executor.submit(resume_job, job_id, model_slug)
+
+
+def resume_held_jobs(model_slug: str = None) -> None:
+    """
+    Dispatch held Jobs (all models if model_slug is None) through resume_executor.
+    Called when a circuit closes and at server startup.
+    """
+    held = Job.objects.filter(held_model__isnull=False)
+    if model_slug is not None:
+        held = held.filter(held_model=model_slug)
+
+    for job_id, held_model in held.order_by('id').values_list('id', 'held_model'):
+        resume_executor.submit(resume_job, job_id, held_model)
+
+
+def resume_held_jobs_on_startup() -> None:
+    """
+    Pick up jobs held by a previous process. Skipped if the DB is not migrated yet.
+    """
+    try:
+        resume_held_jobs()
+    except DatabaseError:
+        pass
+
+
+# Shared per-model breaker; held jobs are re-dispatched once the provider recovers
+breaker = CircuitBreaker(
+    failure_rate=settings.CIRCUIT_FAILURE_RATE,
+    min_calls=settings.CIRCUIT_MIN_CALLS,
+    window=settings.CIRCUIT_WINDOW,
+    slow_call_seconds=settings.CIRCUIT_SLOW_CALL_SECONDS,
+    cooldown=settings.CIRCUIT_COOLDOWN_SECONDS,
+    probe_timeout=settings.CIRCUIT_PROBE_TIMEOUT_SECONDS,
+    on_half_open=probe_held_jobs,
+    on_close=resume_held_jobs,
+)
+
+
 def process_job(job_id: int, model_slug: str) -> None:
     """
     Background worker: processes a Job by calling the LLM,
     validating the response, and saving the result.
+    Jobs are held in 'queued' instead of failing while the provider is down.
     """
     job = Job.objects.get(id=job_id)
+    if breaker.is_open(model_slug):
+        hold_job(job, model_slug)
+        return
+
     job.status = 'processing'
-    job.save(update_fields=['status'])
+    job.held_model = None
+    # auto_now is only applied to update_fields that list updated_at;
+    # retention relies on it to know when a job last changed
+    job.save(update_fields=['status', 'held_model', 'updated_at'])
 
     cv_text = read_uploaded_file_text(job.cv_file) if job.cv_file else ''
     report_text = read_uploaded_file_text(job.report_file) if job.report_file else ''
@@ -76,7 +171,7 @@ def process_job(job_id: int, model_slug: str) -> None:
         {'role': 'user', 'content': build_prompt(job_desc, cv_text, report_text, DEFAULT_RUBRIC)},
     ]
 
-    client = OpenRouterClient()
+    client = OpenRouterClient(breaker=breaker)
     try:
         out = client.chat(
             model=model_slug,
@@ -88,9 +183,12 @@ def process_job(job_id: int, model_slug: str) -> None:
 
         # --- Handle rate limit explicitly ---
         if isinstance(out, dict) and out.get('code') == 429:
+            if breaker.is_open(model_slug):
+                hold_job(job, model_slug)
+                return
             job.result = out
             job.status = 'rate_limited'
-            job.save(update_fields=['result', 'status'])
+            job.save(update_fields=['result', 'status', 'updated_at'])
             return
 
         # Validate and save
@@ -101,15 +199,21 @@ def process_job(job_id: int, model_slug: str) -> None:
             job.result = {'error': f'Validation failed: {ve}', 'raw': out}
 
         job.status = 'completed'
-        job.save(update_fields=['result', 'status'])
+        job.save(update_fields=['result', 'status', 'updated_at'])
+
+    except CircuitOpenError:
+        hold_job(job, model_slug)
 
     except Exception as e:
+        if breaker.is_open(model_slug):
+            hold_job(job, model_slug)
+            return
         job.result = {
             'error': str(e),
             'trace': traceback.format_exc(limit=2),
         }
         job.status = 'completed'
-        job.save(update_fields=['result', 'status'])
+        job.save(update_fields=['result', 'status', 'updated_at'])
 
 
 # ----- API Views -----
@@ -144,7 +248,7 @@ class EvaluateView(APIView):
         model_slug = config('OPENROUTER_MODEL', default='openrouter/auto')
 
         # Launch background thread
-        threading.Thread(target=process_job, args=(job.id, model_slug), daemon=True).start()
+        dispatch_job(job.id, model_slug)
 
         return Response({'id': job.id, 'status': 'queued'})
 
@@ -153,12 +257,17 @@ class ResultView(APIView):
     '''
     GET /result/{id}
     Retrieve the current status and result of the evaluation job.
+    Falls back to the archive for jobs moved out by archive_jobs.
     '''
     def get(self, request, job_id: int):
         try:
             job = Job.objects.get(id=job_id)
         except Job.DoesNotExist:
-            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+            try:
+                archived = ArchivedJob.objects.get(job_id=job_id)
+            except ArchivedJob.DoesNotExist:
+                return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(ArchivedJobResultSerializer(archived).data)
 
         serializer = JobResultSerializer(job)
         return Response(serializer.data)